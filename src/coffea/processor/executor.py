@@ -295,6 +295,13 @@ def _decompress(item):
         return item
 
 
+def _decompress_file(path):
+    # like _decompress, but streams from the file so that the compressed
+    # bytes are never held in memory as a whole.
+    with lz4f.open(path, mode="rb") as f:
+        return pickle.load(f)
+
+
 class _compression_wrapper:
     def __init__(self, level, function, name=None):
         self.level = level
@@ -1,10 +1,13 @@
 import collections
+import heapq
 import math
 import os
-import re
 import signal
+import time
 from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from functools import lru_cache, partial
 from multiprocessing.pool import ThreadPool
 from os.path import join
 
@@ -19,6 +22,7 @@ from .executor import (
     WorkItem,
     _compression_wrapper,
     _decompress,
+    _decompress_file,
 )
 
 # The TaskVine object is global b/c we want to
@@ -30,24 +34,30 @@ manager = None
 # have been already processed.
 early_terminate = False
 
+# TaskVine categories of the tasks created by the executor.
+_TASK_CATEGORIES = ("default", "preprocessing", "processing", "accumulating")
 
-def accumulate_result_files(files_to_accumulate, accumulator=None, concurrent_reads=2):
-    def read_file(f):
-        with open(f, "rb") as rf:
-            return _decompress(rf.read())
-
-    from coffea.processor import accumulate
 
+def accumulate_result_files(files_to_accumulate, accumulator=None, concurrent_reads=2):
     with ThreadPool(max(concurrent_reads, 1)) as pool:
-        for result in pool.imap_unordered(read_file, list(files_to_accumulate), 1):
-            if not accumulator:
-                accumulator = result
-            else:
-                accumulator = accumulate([result], accumulator)
+        results = pool.imap_unordered(_decompress_file, files_to_accumulate, 1)
+        if not accumulator:
+            # bootstrap from the first result, so that it is updated in place
+            # rather than copied.
+            accumulator = next(results, accumulator)
+        accumulator = accumulate(results, accumulator)
 
     return accumulator
 
 
+def _accumulate_result_files_wrapper(compression, concurrent_reads):
+    return _compression_wrapper(
+        compression,
+        partial(accumulate_result_files, concurrent_reads=concurrent_reads),
+        name="accumulate_result_files",
+    )
+
+
 try:
     import ndcctools.taskvine as vine
     from ndcctools.taskvine import Manager, PythonTask, PythonTaskNoResult
@@ -219,9 +229,9 @@ class TaskVineExecutor(ExecutorBase):
             else:
                 result = manager._processing(items, function, accumulator)
                 manager = None
-        except Exception as e:
+        except Exception:
             manager = None
-            raise e
+            raise
 
         return result, 0
 
@@ -240,10 +250,17 @@ class CoffeaVine(Manager):
         # its constituents.
         self.known_workitems = set()
 
-        # list that keeps results as they finish to construct accumulation
-        # tasks.
+        # heap that keeps results as they finish to construct accumulation
+        # tasks, smallest and fastest tasks first. Use _push_to_accumulate and
+        # _pop_to_accumulate to modify it.
         self.tasks_to_accumulate = []
 
+        # output files are removed in the background so that slow shared
+        # filesystems do not stall waiting for tasks. Several threads, so that
+        # the many removals triggered by an accumulation checkpoint overlap.
+        # Created on first use, as a manager may outlive a run.
+        self._removal_pool = None
+
         super().__init__(
             port=self.executor.port,
             name=self.executor.manager_name,
@@ -283,14 +300,16 @@ class CoffeaVine(Manager):
 
     def submit(self, task):
         taskid = super().submit(task)
-        self.console(
-            "submitted {category} task id {id} item {item}, with {size} {unit}(s)",
-            category=task.category,
-            id=taskid,
-            item=task.itemid,
-            size=len(task),
-            unit=self.executor.unit,
-        )
+        # only query the task for the log line when it is going to be printed
+        if self.console.verbose_mode:
+            self.console(
+                "submitted {category} task id {id} item {item}, with {size} {unit}(s)",
+                category=task.category,
+                id=taskid,
+                item=task.itemid,
+                size=len(task),
+                unit=self.executor.unit,
+            )
         return taskid
 
     def wait(self, timeout=None):
@@ -309,6 +328,22 @@ class CoffeaVine(Manager):
             return task
         return None
 
+    def remove_file(self, name):
+        if self._removal_pool is None:
+            self._removal_pool = ThreadPoolExecutor(max_workers=4)
+        future = self._removal_pool.submit(_remove_file, name)
+        future.add_done_callback(self._report_removal)
+
+    def _wait_for_removals(self):
+        if self._removal_pool is not None:
+            self._removal_pool.shutdown(wait=True)
+            self._removal_pool = None
+
+    def _report_removal(self, future):
+        error = future.exception()
+        if error is not None:
+            self.console.warn(f"could not remove output file: {error}")
+
     def application_info(self):
         return {
             "application_info": {
@@ -354,14 +389,15 @@ class CoffeaVine(Manager):
                     task.resubmit(self)
                 self.bar.refresh()
 
+        self.bar.refresh(force=True)
         self.bar.stop_task("Preprocessing")
         return accumulator
 
     def _submit_processing_tasks(self, proc_fn, items):
+        sc = self.stats_coffea
         while True:
             if early_terminate or self._items_empty:
                 return
-            sc = self.stats_coffea
             if sc["chunks_submitted"] >= sc["chunks_total"]:
                 return
             if not self.hungry():
@@ -381,7 +417,25 @@ class CoffeaVine(Manager):
         self.stats_coffea["chunks_submitted"] += 1
 
     def all_to_accumulate_local(self):
-        return all([t.is_checkpoint() for t in self.tasks_to_accumulate])
+        return all(entry[-1].is_checkpoint() for entry in self.tasks_to_accumulate)
+
+    def _push_to_accumulate(self, task):
+        # task ids are unique, thus tasks themselves are never compared.
+        heapq.heappush(
+            self.tasks_to_accumulate,
+            (
+                len(task),
+                task.get_metric("time_workers_execute_last"),
+                task.id,
+                task,
+            ),
+        )
+
+    def _pop_to_accumulate(self, n=None):
+        heap = self.tasks_to_accumulate
+        if n is None or n >= len(heap):
+            n = len(heap)
+        return [heapq.heappop(heap)[-1] for _ in range(n)]
 
     def _final_accumulation(self, accumulator):
         if len(self.tasks_to_accumulate) < 1:
@@ -389,11 +443,14 @@ class CoffeaVine(Manager):
             return accumulator
 
         self.console("Merging with local final accumulator...")
+        tasks = self._pop_to_accumulate()
         accumulator = accumulate_result_files(
-            [t.output_file.source() for t in self.tasks_to_accumulate], accumulator
+            [t.output_file.source() for t in tasks],
+            accumulator,
+            concurrent_reads=self.executor.concurrent_reads,
         )
 
-        for t in self.tasks_to_accumulate:
+        for t in tasks:
             t.cleanup_outputs(self)
 
         sc = self.stats_coffea
@@ -406,10 +463,8 @@ class CoffeaVine(Manager):
 
     def _processing(self, items, function, accumulator):
         function = _compression_wrapper(self.executor.compression, function)
-        accumulate_fn = _compression_wrapper(
-            self.executor.compression,
-            accumulate_result_files,
-            self.executor.concurrent_reads,
+        accumulate_fn = _accumulate_result_files_wrapper(
+            self.executor.compression, self.executor.concurrent_reads
         )
 
         sc = self.stats_coffea
@@ -428,10 +483,14 @@ class CoffeaVine(Manager):
 
         signal.signal(signal.SIGINT, _handle_early_terminate)
 
-        self._process_events(function, accumulate_fn, items)
+        try:
+            self._process_events(function, accumulate_fn, items)
 
-        # merge results with original accumulator given by the executor
-        accumulator = self._final_accumulation(accumulator)
+            # merge results with original accumulator given by the executor
+            accumulator = self._final_accumulation(accumulator)
+        finally:
+            # wait for pending removals of output files
+            self._wait_for_removals()
 
         self._update_bars(final_update=True)
         return accumulator
@@ -454,23 +513,36 @@ class CoffeaVine(Manager):
 
             self._submit_processing_tasks(proc_fn, items)
 
-            # When done submitting, look for completed tasks.
+            # When done submitting, look for completed tasks. After the first
+            # one, collect without blocking any others that are already done,
+            # up to a tree reduction worth of them, so that accumulation tasks
+            # and bars are updated once per batch.
             task = self.wait(5)
-            if task:
-                if not task.successful():
-                    task.resubmit(self)
-                    continue
-                self.tasks_to_accumulate.append(task)
-                if re.match("processing", task.category):
-                    sc["chunks_processed"] += 1
-                elif task.category == "accumulating":
-                    sc["accumulations_done"] += 1
-                else:
-                    raise RuntimeError(f"Unrecognized task category {task.category}")
+            done = 0
+            while task:
+                self._process_completed_task(task)
+                done += 1
+                if done >= self.executor.treereduction:
+                    break
+                task = self.wait(0)
 
             self._submit_accum_tasks(accum_fn)
             self._update_bars()
 
+    def _process_completed_task(self, task):
+        if not task.successful():
+            task.resubmit(self)
+            return
+
+        sc = self.stats_coffea
+        self._push_to_accumulate(task)
+        if task.category == "processing":
+            sc["chunks_processed"] += 1
+        elif task.category == "accumulating":
+            sc["accumulations_done"] += 1
+        else:
+            raise RuntimeError(f"Unrecognized task category {task.category}")
+
     def _submit_accum_tasks(self, accum_fn):
         def _group(lst, n):
             total = len(lst)
@@ -504,22 +576,16 @@ class CoffeaVine(Manager):
         if (len(self.tasks_to_accumulate) < (factor * treereduction) - 1) and not force:
             return
 
-        self.tasks_to_accumulate.sort(
-            key=lambda t: t.get_metric("time_workers_execute_last")
-        )
-        self.tasks_to_accumulate.sort(key=lambda t: len(t))
-
         if force:
-            work_list = self.tasks_to_accumulate
-            self.tasks_to_accumulate = []
+            work_list = self._pop_to_accumulate()
         else:
             split = max(1, (factor - 1)) * treereduction
-            work_list = self.tasks_to_accumulate[0:split]
-            self.tasks_to_accumulate = self.tasks_to_accumulate[split:]
+            work_list = self._pop_to_accumulate(split)
 
         for next_to_accum in _group(work_list, treereduction):
             if len(next_to_accum) < 2 and not force:
-                self.tasks_to_accumulate.extend(next_to_accum)
+                for t in next_to_accum:
+                    self._push_to_accumulate(t)
                 continue
 
             nall = len(next_to_accum)
@@ -578,7 +644,7 @@ class CoffeaVine(Manager):
         mode = "max"
         if executor.resources_mode == "fixed":
             mode = "fixed"
-        for category in "default preprocessing processing accumulating".split():
+        for category in _TASK_CATEGORIES:
             self.set_category_mode(category, mode)
             self.set_category_resources_max(category, default_resources)
 
@@ -588,8 +654,8 @@ class CoffeaVine(Manager):
 
         # enable fast termination of workers
         fast_terminate = executor.fast_terminate_workers
-        for category in "default preprocessing processing accumulating".split():
-            if fast_terminate and fast_terminate > 1:
+        if fast_terminate and fast_terminate > 1:
+            for category in _TASK_CATEGORIES:
                 self.activate_fast_abort_category(category, fast_terminate)
 
     def _make_process_bars(self):
@@ -602,7 +668,7 @@ class CoffeaVine(Manager):
         self.bar.add_task(
             "Processed", total=sc["chunks_total"], unit=self.executor.unit
         )
-        self.bar.add_task("Accumulated", total=math.ceil(accums), unit="tasks")
+        self.bar.add_task("Accumulated", total=accums, unit="tasks")
 
         self.stats_coffea["chunks_processed"] = 0
         self.stats_coffea["accumulations_done"] = 0
@@ -631,7 +697,7 @@ class CoffeaVine(Manager):
                 if items_to_accum <= self.executor.treereduction:
                     accums += 1
                     break
-                step = math.floor(items_to_accum / self.executor.treereduction)
+                step = items_to_accum // self.executor.treereduction
                 accums += step
                 items_to_accum -= step * self.executor.treereduction
             return accums
@@ -650,7 +716,7 @@ class CoffeaVine(Manager):
 
         sc["estimated_total_accumulations"] = accums
 
-        self.bar.refresh()
+        self.bar.refresh(force=final_update)
         if final_update:
             self.bar.stop()
 
@@ -705,12 +771,9 @@ class CoffeaVineTask(PythonTask):
         pass
 
     def cleanup_outputs(self, m):
-        try:
-            name = self.output_file.source()
-            if name:
-                os.remove(name)
-        except FileNotFoundError:
-            pass
+        name = self.output_file.source()
+        if name:
+            m.remove_file(name)
         m.undeclare_file(self.output_file)
 
     def clone(self, m):
@@ -810,11 +873,7 @@ class PreProcTask(CoffeaVineTask):
         super().__init__(m, fn, [self.item], itemid, bring_back_output=True)
 
         self.set_category("preprocessing")
-        if re.search("://", item.filename) or os.path.isabs(item.filename):
-            # This looks like an URL or an absolute path (assuming shared
-            # filesystem). Not transferring file.
-            pass
-        else:
+        if not _is_url_or_abspath(item.filename):
             f = m.declare_file(item.filename, cache=False)
             self.add_input(f, item.filename)
 
@@ -843,11 +902,7 @@ class ProcTask(CoffeaVineTask):
         super().__init__(m, fn, [item], itemid, bring_back_output=bring_back_output)
 
         self.set_category("processing")
-        if re.search("://", item.filename) or os.path.isabs(item.filename):
-            # This looks like an URL or an absolute path (assuming shared
-            # filesystem). Not transferring file.
-            pass
-        else:
+        if not _is_url_or_abspath(item.filename):
             f = m.declare_file(item.filename, cache=False)
             self.add_input(f, item.filename)
 
@@ -991,6 +1046,21 @@ def _handle_early_terminate(signum, frame, raise_on_repeat=True):
         manager.cancel_by_category("accumulating")
 
 
+@lru_cache(maxsize=4096)
+def _is_url_or_abspath(filename):
+    # Files given as an URL or an absolute path (assuming shared filesystem)
+    # are read in place by the task, rather than transferred. Cached as
+    # every chunk of a file performs this check.
+    return "://" in filename or os.path.isabs(filename)
+
+
+def _remove_file(name):
+    try:
+        os.remove(name)
+    except FileNotFoundError:
+        pass
+
+
 def _get_x509_proxy(x509_proxy=None):
     if x509_proxy:
         return x509_proxy
@@ -1011,23 +1081,25 @@ class ResultUnavailable(Exception):
 
 
 class Stats(collections.defaultdict):
+    __slots__ = ()
+
     def __init__(self, *args, **kwargs):
         super().__init__(int, *args, **kwargs)
 
+    # use get rather than indexing, as a missing stat would otherwise default
+    # to 0 and take part in the comparison.
     def min(self, stat, value):
-        try:
-            self[stat] = min(self[stat], value)
-        except KeyError:
-            self[stat] = value
+        current = self.get(stat)
+        self[stat] = value if current is None else min(current, value)
 
     def max(self, stat, value):
-        try:
-            self[stat] = max(self[stat], value)
-        except KeyError:
-            self[stat] = value
+        current = self.get(stat)
+        self[stat] = value if current is None else max(current, value)
 
 
 class VerbosePrint:
+    __slots__ = ("console", "status_mode", "verbose_mode")
+
     def __init__(self, console, status_mode=True, verbose_mode=True):
         self.console = console
         self.status_mode = status_mode
@@ -1044,7 +1116,8 @@ class VerbosePrint:
             print(msg)
 
     def printf(self, format_str, *args, **kwargs):
-        msg = format_str.format(*args, **kwargs)
+        # messages without arguments are already formatted (e.g. f-strings)
+        msg = format_str.format(*args, **kwargs) if args or kwargs else format_str
         self.print(msg)
 
     def warn(self, format_str, *args, **kwargs):
@@ -1058,9 +1131,11 @@ class VerbosePrint:
 # Support for rich_bar so that we can keep track of bars by their names, rather
 # than the changing bar ids.
 class StatusBar:
-    def __init__(self, enabled=True):
+    def __init__(self, enabled=True, refresh_interval=0.1):
         self._prog = rich_bar()
         self._ids = {}
+        self._refresh_interval = refresh_interval
+        self._last_refresh = 0
         if enabled:
             self._prog.start()
 
@@ -1079,6 +1154,14 @@ class StatusBar:
     def advance(self, desc, *args, **kwargs):
         return self._prog.advance(self._ids[desc], *args, **kwargs)
 
+    # redraw at most once every refresh_interval seconds, unless forced, as
+    # tasks may complete faster than the terminal is worth updating.
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if force or now - self._last_refresh >= self._refresh_interval:
+            self._last_refresh = now
+            self._prog.refresh()
+
     # redirect anything else to rich_bar
     def __getattr__(self, name):
         return getattr(self._prog, name)
@@ -6,7 +6,12 @@ import pytest
 from coffea import processor
 from coffea.nanoevents import schemas
 from coffea.processor import Err, Ok
-from coffea.processor.executor import UprootMissTreeError
+from coffea.processor.executor import (
+    UprootMissTreeError,
+    _compress,
+    _decompress,
+    _decompress_file,
+)
 from coffea.processor.test_items import NanoEventsProcessor
 
 _exceptions = (FileNotFoundError, UprootMissTreeError, pyarrow.ArrowInvalid)
@@ -464,3 +469,14 @@ def test_use_result_type_requires_skipbadfiles():
         use_result_type=True,
         skipbadfiles=(FileNotFoundError,),
     )
+
+
+def test_decompress_file(tmp_path):
+    item = {"a": [1, 2, 3], "b": "hello"}
+    compressed = _compress(item, 1)
+
+    path = tmp_path / "item.lz4"
+    path.write_bytes(compressed)
+
+    assert _decompress_file(str(path)) == item
+    assert _decompress_file(str(path)) == _decompress(compressed)
@@ -0,0 +1,256 @@
+from multiprocessing.pool import ThreadPool
+from types import SimpleNamespace
+
+import pytest
+
+from coffea.processor import taskvine_executor
+from coffea.processor.executor import _compress, _decompress
+from coffea.processor.taskvine_executor import (
+    CoffeaVine,
+    Stats,
+    VerbosePrint,
+    _accumulate_result_files_wrapper,
+    accumulate_result_files,
+)
+
+
+def _write_results(tmp_path, results):
+    files = []
+    for i, result in enumerate(results):
+        path = tmp_path / f"result.{i}"
+        path.write_bytes(_compress(result, 1))
+        files.append(str(path))
+    return files
+
+
+def test_accumulate_result_files_empty():
+    assert accumulate_result_files([]) is None
+
+    accumulator = {}
+    assert accumulate_result_files([], accumulator) is accumulator
+
+
+def test_accumulate_result_files_single(tmp_path):
+    files = _write_results(tmp_path, [{"a": 1, "b": 2}])
+    assert accumulate_result_files(files) == {"a": 1, "b": 2}
+
+
+@pytest.mark.parametrize("concurrent_reads", [0, 1, 2, 4])
+def test_accumulate_result_files_in_place(tmp_path, concurrent_reads):
+    files = _write_results(tmp_path, [{"a": 1}, {"a": 2, "b": 1}, {"b": 3}])
+
+    accumulator = {"a": 10}
+    out = accumulate_result_files(files, accumulator, concurrent_reads=concurrent_reads)
+    assert out is accumulator
+    assert out == {"a": 13, "b": 4}
+
+
+def test_accumulate_result_files_wrapper(tmp_path, monkeypatch):
+    pool_sizes = []
+
+    def thread_pool(processes):
+        pool_sizes.append(processes)
+        return ThreadPool(processes)
+
+    monkeypatch.setattr(taskvine_executor, "ThreadPool", thread_pool)
+
+    accumulate_fn = _accumulate_result_files_wrapper(1, 3)
+    # the read concurrency must not end up as the name of the wrapper
+    assert str(accumulate_fn) == "accumulate_result_files"
+
+    files = _write_results(tmp_path, [{"a": 1}, {"a": 2, "b": 1}, {"b": 3}])
+    assert _decompress(accumulate_fn(files)) == {"a": 3, "b": 4}
+    assert pool_sizes == [3]
+
+
+def test_stats_min_max():
+    stats = Stats()
+
+    # the first value is stored as given
+    stats.min("positive", 5)
+    stats.max("negative", -3)
+    assert stats["positive"] == 5
+    assert stats["negative"] == -3
+
+    # missing stats do not take part in the comparison as 0
+    stats.min("positive", 7)
+    stats.min("positive", 2)
+    assert stats["positive"] == 2
+
+    stats.max("negative", -8)
+    stats.max("negative", -1)
+    assert stats["negative"] == -1
+
+    # counters still default to 0
+    stats["counter"] += 1
+    assert stats["counter"] == 1
+
+
+class _RecordingConsole:
+    def __init__(self):
+        self.messages = []
+
+    def print(self, msg):
+        self.messages.append(msg)
+
+
+def test_verbose_print_status_mode():
+    console = _RecordingConsole()
+    vprint = VerbosePrint(console, status_mode=True, verbose_mode=True)
+
+    # messages without arguments are printed as given
+    vprint.printf("no {{fields}} here")
+    # messages with arguments are formatted
+    vprint.printf("item {} of {total}", 1, total=2)
+    vprint.warn("item {} failed", 3)
+    vprint.warn("literal {braces}")
+
+    assert console.messages == [
+        "no {{fields}} here",
+        "item 1 of 2",
+        "[red]WARNING:[/red] item 3 failed",
+        "[red]WARNING:[/red] literal {braces}",
+    ]
+
+
+def test_verbose_print_plain_mode(capsys):
+    vprint = VerbosePrint(None, status_mode=False, verbose_mode=False)
+
+    vprint.printf("no {{fields}} here")
+    vprint.printf("item {} of {total}", 1, total=2)
+    vprint.warn("item {} failed", 3)
+    vprint.warn("literal {braces}")
+    # not printed, as verbose mode is off
+    vprint("submitted {}", 4)
+
+    assert capsys.readouterr().out.splitlines() == [
+        "no {{fields}} here",
+        "item 1 of 2",
+        "WARNING: item 3 failed",
+        "WARNING: literal {braces}",
+    ]
+
+
+def _make_manager(cls=CoffeaVine, **executor_options):
+    # bypass Manager.__init__, so that no TaskVine manager is started
+    m = cls.__new__(cls)
+    m.executor = SimpleNamespace(compression=1, concurrent_reads=2, **executor_options)
+    m.stats_coffea = Stats()
+    m.tasks_to_accumulate = []
+    m._removal_pool = None
+    m.console = VerbosePrint(_RecordingConsole(), status_mode=True, verbose_mode=False)
+    return m
+
+
+def test_remove_file_after_processing(tmp_path, monkeypatch):
+    monkeypatch.setattr(taskvine_executor.signal, "signal", lambda *args: None)
+
+    m = _make_manager()
+    m._make_process_bars = lambda: None
+    m._process_events = lambda proc_fn, accum_fn, items: None
+    m._final_accumulation = lambda accumulator: accumulator
+    m._update_bars = lambda final_update=False: None
+
+    first = tmp_path / "first"
+    first.write_bytes(b"")
+    m.remove_file(str(first))
+    assert m._processing([], lambda item: item, {}) == {}
+    assert not first.exists()
+
+    # the manager may be reused after a run, e.g. after an interrupt
+    second = tmp_path / "second"
+    second.write_bytes(b"")
+    m.remove_file(str(second))
+    m._wait_for_removals()
+    assert not second.exists()
+    assert m.console.console.messages == []
+
+
+class _StubTask:
+    def __init__(self, id, size, execute_time, checkpoint=False):
+        self.id = id
+        self.size = size
+        self.execute_time = execute_time
+        self.checkpoint = checkpoint
+
+    def __len__(self):
+        return self.size
+
+    def get_metric(self, name):
+        assert name == "time_workers_execute_last"
+        return self.execute_time
+
+    def is_checkpoint(self):
+        return self.checkpoint
+
+
+def _stub_tasks():
+    return [
+        _StubTask(1, size=20, execute_time=5),
+        _StubTask(2, size=10, execute_time=30),
+        _StubTask(3, size=20, execute_time=1),
+        _StubTask(4, size=10, execute_time=10),
+        _StubTask(5, size=5, execute_time=50),
+    ]
+
+
+def test_tasks_to_accumulate_order():
+    tasks = _stub_tasks()
+
+    m = _make_manager()
+    for t in tasks:
+        m._push_to_accumulate(t)
+
+    # same order as sorting by execution time and then (stable) by size
+    expected = sorted(tasks, key=lambda t: t.get_metric("time_workers_execute_last"))
+    expected.sort(key=lambda t: len(t))
+    assert [t.id for t in expected] == [5, 4, 2, 3, 1]
+
+    assert m._pop_to_accumulate(2) == expected[:2]
+    assert len(m.tasks_to_accumulate) == 3
+
+    # asking for more than available returns everything that is left
+    assert m._pop_to_accumulate(10) == expected[2:]
+    assert m.tasks_to_accumulate == []
+
+    # pushing back, in any order, keeps the order
+    for t in reversed(expected):
+        m._push_to_accumulate(t)
+    assert m._pop_to_accumulate() == expected
+
+
+def test_all_to_accumulate_local():
+    m = _make_manager()
+    assert m.all_to_accumulate_local()
+
+    tasks = _stub_tasks()
+    for t in tasks:
+        t.checkpoint = True
+        m._push_to_accumulate(t)
+    assert m.all_to_accumulate_local()
+
+    m._push_to_accumulate(_StubTask(6, size=1, execute_time=1))
+    assert not m.all_to_accumulate_local()
+
+
+def test_submit_accum_tasks_pushes_back_leftovers():
+    class _Manager(CoffeaVine):
+        # TaskVine queue stats: nothing waiting, one task still running
+        stats = SimpleNamespace(tasks_waiting=0, tasks_on_workers=1)
+
+        def submit(self, task):
+            raise AssertionError("a single task should not be accumulated")
+
+    m = _make_manager(_Manager, treereduction=2, checkpoint_proportion=0.1)
+    m.stats_coffea["chunks_total"] = 1
+    m.stats_coffea["chunks_processed"] = 1
+
+    leftover = _StubTask(1, size=10, execute_time=3, checkpoint=True)
+    m._push_to_accumulate(leftover)
+    m._submit_accum_tasks(accum_fn=None)
+
+    assert m.tasks_to_accumulate == [(10, 3, 1, leftover)]
+    assert m.all_to_accumulate_local()
+
+    m._push_to_accumulate(_StubTask(2, size=5, execute_time=3))
+    assert m._pop_to_accumulate()[1] is leftover